@@ -4,6 +4,7 @@
 #include "esp_codec_dev.h"
 #include "esp_codec_dev_defaults.h"
 #include "mbedtls/base64.h"
+#include "cJSON.h"
 #include "sdui_bus.h"
 #include "freertos/FreeRTOS.h"
 #include "freertos/task.h"
@@ -21,6 +22,13 @@ static bool is_recording = false;
 
 #define PCM_CHUNK_SIZE 1024
 
+// 裸 PCM 下行播放的内部 SRAM 中转缓冲 (见 audio_play_pcm)
+#define PCM_PLAY_CHUNK 4096
+static uint8_t *pcm_play_buf = NULL;
+
+// 扬声器链路当前采样率 (audio/play_begin 宣告的格式与之不同时重配)
+static int spk_sample_rate = 22050;
+
 // ========== I2S 引脚与宏定义（复用 BSP 头文件中的常量） ==========
 #define AUDIO_I2S_GPIO_CFG       \
     {                            \
@@ -71,6 +79,75 @@ static void audio_play_callback(const char *base64_data)
     }
 }
 
+// 下行裸 PCM 播放：二进制帧直达，无 base64 解码与临时分配
+void audio_play_pcm(const uint8_t *pcm_data, int len)
+{
+    if (!spk_handle || !pcm_data || len <= 0)
+        return;
+
+    if (pcm_play_buf)
+    {
+        // rx 缓冲可能落在 PSRAM：分块经内部 SRAM 中转后再喂 I2S，
+        // 防止 PSRAM 带宽被占用导致的缺载失真 (与 base64 路径同一考量)
+        while (len > 0)
+        {
+            int n = len > PCM_PLAY_CHUNK ? PCM_PLAY_CHUNK : len;
+            memcpy(pcm_play_buf, pcm_data, n);
+            esp_codec_dev_write(spk_handle, pcm_play_buf, n);
+            pcm_data += n;
+            len -= n;
+        }
+    }
+    else
+    {
+        esp_codec_dev_write(spk_handle, (void *)pcm_data, len);
+    }
+}
+
+// 语段开始：按 begin 帧宣告的采样格式一次性重配扬声器链路，
+// 语段内的 PCM 帧随后经 audio_play_pcm 直接入 I2S 管线
+static void audio_play_begin_callback(const char *payload)
+{
+    if (!spk_handle || !payload)
+        return;
+
+    int rate = 0, bits = 16, ch = 1;
+    cJSON *root = cJSON_Parse(payload);
+    if (root)
+    {
+        cJSON *it;
+        if ((it = cJSON_GetObjectItem(root, "sample_rate")) && cJSON_IsNumber(it)) rate = it->valueint;
+        if ((it = cJSON_GetObjectItem(root, "bits"))        && cJSON_IsNumber(it)) bits = it->valueint;
+        if ((it = cJSON_GetObjectItem(root, "channels"))    && cJSON_IsNumber(it)) ch   = it->valueint;
+        cJSON_Delete(root);
+    }
+
+    if (rate > 0 && rate != spk_sample_rate)
+    {
+        esp_codec_dev_close(spk_handle);
+        esp_codec_dev_sample_info_t fs = {
+            .sample_rate = (uint32_t)rate,
+            .channel = (uint8_t)ch,
+            .bits_per_sample = (uint8_t)bits,
+        };
+        if (esp_codec_dev_open(spk_handle, &fs) == ESP_CODEC_DEV_OK)
+        {
+            spk_sample_rate = rate;
+            ESP_LOGI(TAG, "Speaker reconfigured: %dHz %dbit %dch", rate, bits, ch);
+        }
+        else
+        {
+            ESP_LOGE(TAG, "Speaker reconfig failed (rate=%d)", rate);
+        }
+    }
+}
+
+// 语段结束：esp_codec_dev_write 为同步写，begin/end 之间的数据此刻已全部入队
+static void audio_play_end_callback(const char *payload)
+{
+    ESP_LOGD(TAG, "Utterance playback finished");
+}
+
 // 后台上行录音任务
 static void audio_record_task(void *arg)
 {
@@ -175,6 +252,10 @@ void audio_app_start(void)
         esp_codec_dev_set_out_vol(spk_handle, 70);
         esp_codec_dev_sample_info_t fs = {.sample_rate = 22050, .channel = 1, .bits_per_sample = 16};
         esp_codec_dev_open(spk_handle, &fs);
+        // 预分配裸 PCM 播放中转缓冲 (Wi-Fi 碎片化内部 SRAM 之前)
+        pcm_play_buf = (uint8_t *)heap_caps_malloc(PCM_PLAY_CHUNK, MALLOC_CAP_INTERNAL | MALLOC_CAP_8BIT);
+        if (!pcm_play_buf)
+            ESP_LOGW(TAG, "No internal RAM for PCM staging buffer, will play from RX buffer directly");
         ESP_LOGI(TAG, "Speaker ready.");
     }
     else
@@ -207,6 +288,8 @@ void audio_app_start(void)
         ESP_LOGE(TAG, "Failed to create microphone device via BSP!");
     }
 
-    // 订阅云端下发的音频指令
+    // 订阅云端下发的音频指令 (audio/play 为旧版 base64 路径，保留兼容)
     sdui_bus_subscribe("audio/play", audio_play_callback);
+    sdui_bus_subscribe("audio/play_begin", audio_play_begin_callback);
+    sdui_bus_subscribe("audio/play_end", audio_play_end_callback);
 }
\ No newline at end of file
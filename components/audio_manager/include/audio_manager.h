@@ -2,6 +2,7 @@
 #define AUDIO_MANAGER_H
 
 #include <stdbool.h>
+#include <stdint.h>
 
 #ifdef __cplusplus
 extern "C" {
@@ -20,6 +21,9 @@ bool audio_manager_is_recording(void);
 // 接收云端下发的 Base64 音频并播放
 void audio_play_base64(const char *base64_data);
 
+// 接收云端下发的裸 PCM 音频并播放 (二进制帧路径，由 websocket_manager 直调)
+void audio_play_pcm(const uint8_t *pcm_data, int len);
+
 #ifdef __cplusplus
 }
 #endif
@@ -83,6 +83,18 @@ lv_obj_t *sdui_parser_find_by_id(const char *id);
  */
 void sdui_parser_update(const char *json_str);
 
+/**
+ * @brief 向指定父容器追加一个子组件 (增量构建，不重建整树)
+ *
+ * payload 形如 {"parent_id": "...", "child": {...节点描述...}}，
+ * child 复用与 ui/layout 相同的节点语法。若父容器可滚动，
+ * 追加后自动滚动到新子节点。
+ *
+ * @param json_str ui/append_child 主题的 payload JSON 字符串
+ * @note 必须在 LVGL 加锁状态下调用
+ */
+void sdui_parser_append_child(const char *json_str);
+
 #ifdef __cplusplus
 }
 #endif
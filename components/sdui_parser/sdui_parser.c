@@ -1019,3 +1019,40 @@ void sdui_parser_update(const char *json_str) {
     ESP_LOGI(TAG, "Updated '%s'", id_item->valuestring);
     cJSON_Delete(root);
 }
+
+void sdui_parser_append_child(const char *json_str) {
+    if (!json_str) return;
+    cJSON *root = cJSON_Parse(json_str);
+    if (!root) { ESP_LOGW(TAG, "append_child: JSON parse failed"); return; }
+
+    cJSON *pid = cJSON_GetObjectItem(root, "parent_id");
+    if (!pid || !cJSON_IsString(pid)) {
+        ESP_LOGW(TAG, "append_child: missing 'parent_id'");
+        cJSON_Delete(root);
+        return;
+    }
+    lv_obj_t *parent = sdui_parser_find_by_id(pid->valuestring);
+    if (!parent) {
+        ESP_LOGW(TAG, "append_child: parent '%s' not found", pid->valuestring);
+        cJSON_Delete(root);
+        return;
+    }
+
+    cJSON *child = cJSON_GetObjectItem(root, "child");
+    if (!child || !cJSON_IsObject(child)) {
+        ESP_LOGW(TAG, "append_child: missing 'child'");
+        cJSON_Delete(root);
+        return;
+    }
+
+    uint32_t before = lv_obj_get_child_count(parent);
+    parse_node(child, parent);
+
+    /* 追加成功后滚动到新子节点，保证最新内容可见 */
+    if (lv_obj_get_child_count(parent) > before) {
+        if (lv_obj_has_flag(parent, LV_OBJ_FLAG_SCROLLABLE))
+            lv_obj_scroll_to_view(lv_obj_get_child(parent, -1), LV_ANIM_ON);
+        ESP_LOGI(TAG, "Appended child to '%s'", pid->valuestring);
+    }
+    cJSON_Delete(root);
+}
@@ -2,10 +2,14 @@
 #include "esp_websocket_client.h"
 #include "esp_log.h"
 #include "esp_heap_caps.h"
+#include "audio_manager.h"
 #include <string.h>
 
 static const char *TAG = "WS_MANAGER";
 
+// 下行二进制帧子协议：首字节为 topic 标签，其余为裸载荷
+#define WS_BIN_TAG_AUDIO_PLAY 0x01  // 服务器 → 终端: TTS PCM 流
+
 static esp_websocket_client_handle_t client = NULL;
 static websocket_rx_cb_t global_rx_cb = NULL;
 static bool is_connected = false;
@@ -13,6 +17,7 @@ static bool is_connected = false;
 // 大体积载荷拼接缓冲区
 static char *rx_buffer = NULL;
 static int rx_buffer_len = 0;
+static bool rx_is_binary = false;
 
 static void websocket_event_handler(void *handler_args, esp_event_base_t base, int32_t event_id, void *event_data)
 {
@@ -36,9 +41,9 @@ static void websocket_event_handler(void *handler_args, esp_event_base_t base, i
             break;
 
         case WEBSOCKET_EVENT_DATA:
-            // 仅处理文本帧 (0x01) 或二进制流延续帧 (0x00)
-            if (data->op_code == 0x01 || data->op_code == 0x00) {
-                
+            // 处理文本帧 (0x01)、二进制帧 (0x02) 或流延续帧 (0x00)
+            if (data->op_code == 0x01 || data->op_code == 0x02 || data->op_code == 0x00) {
+
                 // 数据包起始标识
                 if (data->payload_offset == 0) {
                     if (rx_buffer) {
@@ -47,6 +52,9 @@ static void websocket_event_handler(void *handler_args, esp_event_base_t base, i
                     // 为长数据分配连续的内部或外部 RAM
                     rx_buffer = (char *)heap_caps_malloc(data->payload_len + 1, MALLOC_CAP_8BIT);
                     rx_buffer_len = 0;
+                    if (data->op_code != 0x00) {
+                        rx_is_binary = (data->op_code == 0x02); // 延续帧沿用起始帧类型
+                    }
                     if (!rx_buffer) {
                         ESP_LOGE(TAG, "No memory for RX buffer (size: %d)", data->payload_len);
                         return;
@@ -59,12 +67,21 @@ static void websocket_event_handler(void *handler_args, esp_event_base_t base, i
                     rx_buffer_len += data->data_len;
                 }
 
-                // 完整帧接收完毕
+                // 完整帧接收完毕，按首字节区分载荷类型：
+                // 服务端的 JSON 信封可能以文本帧也可能以二进制帧送达 (orjson 产出
+                // bytes)，但必以 '{' 开头；tag 字节 (<0x20) 则为裸载荷直通通道
                 if (rx_buffer_len == data->payload_len) {
-                    rx_buffer[rx_buffer_len] = '\0'; // 字符串封尾
-                    
-                    if (global_rx_cb) {
-                        global_rx_cb(rx_buffer); // 推入 SDUI 总线
+                    if (rx_is_binary && rx_buffer_len > 1 && (uint8_t)rx_buffer[0] == WS_BIN_TAG_AUDIO_PLAY) {
+                        audio_play_pcm((const uint8_t *)rx_buffer + 1, rx_buffer_len - 1);
+                    } else if (!rx_is_binary || (rx_buffer_len > 0 && rx_buffer[0] == '{')) {
+                        rx_buffer[rx_buffer_len] = '\0'; // 字符串封尾
+
+                        if (global_rx_cb) {
+                            global_rx_cb(rx_buffer); // 推入 SDUI 总线
+                        }
+                    } else {
+                        ESP_LOGW(TAG, "Unknown binary tag: 0x%02x (len: %d)",
+                                 rx_buffer_len > 0 ? (uint8_t)rx_buffer[0] : 0, rx_buffer_len);
                     }
 
                     // 用完即焚，释放内存池
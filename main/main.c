@@ -39,6 +39,16 @@ static void on_ui_update(const char *payload)
     bsp_display_unlock();
 }
 
+/* ---- SDUI 总线回调：处理 ui/append_child 主题（增量追加子组件） ---- */
+static void on_ui_append_child(const char *payload)
+{
+    if (!payload) return;
+    bsp_display_lock(-1);
+    lv_disp_trig_activity(NULL);
+    sdui_parser_append_child(payload);
+    bsp_display_unlock();
+}
+
 /* ---- SDUI 总线回调：处理 audio/cmd/record_start（本地事件路由） ---- */
 static void on_audio_record_start(const char *payload)
 {
@@ -192,6 +202,7 @@ void app_main(void)
     //    -- 下行 UI 主题 --
     sdui_bus_subscribe("ui/layout", on_ui_layout);   // 全量布局渲染
     sdui_bus_subscribe("ui/update", on_ui_update);   // 增量属性更新
+    sdui_bus_subscribe("ui/append_child", on_ui_append_child); // 增量追加子组件
 
     //    -- 本地硬件事件主题 (由 Action URI local:// 触发) --
     sdui_bus_subscribe("audio/cmd/record_start", on_audio_record_start);                
@@ -1,13 +1,17 @@
 import asyncio
+import sys
 import websockets
-import json
+import orjson
+import msgspec
 import logging
-import base64
-import wave
-import io
+import binascii
+import struct
+import numpy as np
 import os
 import time
-from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 # AI 相关依赖
 from openai import AsyncOpenAI
@@ -17,8 +21,9 @@ import edge_tts
 # ============================================================
 #  SDUI Gateway Server — DeepSeek AI 语音对话终端
 # ============================================================
+# 日志级别支持环境变量覆盖 (排查问题时 SDUI_LOG_LEVEL=DEBUG)
 logging.basicConfig(
-    level=logging.INFO,
+    level=os.getenv("SDUI_LOG_LEVEL", "INFO"),
     format='%(asctime)s [%(levelname)s] %(message)s'
 )
 logging.getLogger("websockets").setLevel(logging.WARNING)
@@ -29,28 +34,109 @@ DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "sk-ce6b2df0dfa6455e9c862f033db
 aclient = AsyncOpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com")
 
 # 2. Faster-Whisper 本地 STT 配置
-logging.info("⏳ 正在加载本地 Whisper STT 模型...")
-# 使用 CPU 和 int8 量化，保证在普通机器上也有极快的推理速度
-whisper_model = WhisperModel("base", device="cpu", compute_type="int8")
-executor = ThreadPoolExecutor(max_workers=4)
-logging.info("✅ STT 模型加载完毕")
+# Whisper int8 推理是 CPU 密集任务且释放 GIL 不稳定，线程池里多设备并发会在
+# 解释器上互相卡；改用进程池，每个 worker 进程经 initializer 各自加载一份模型，
+# 多设备同时说话时真正并行。worker 数对齐物理核心 (cpu_count 的一半)。
+STT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+_whisper_model = None # 仅在 STT worker 进程内有效 (线程回退模式下在主进程)
+
+def _stt_init():
+    global _whisper_model
+    logging.info("⏳ 正在加载本地 Whisper STT 模型...")
+    # 使用 CPU 和 int8 量化，保证在普通机器上也有极快的推理速度
+    # cpu_threads 按 worker 数均分核心
+    _whisper_model = WhisperModel(
+        "base", device="cpu", compute_type="int8",
+        cpu_threads=max(1, (os.cpu_count() or 2) // STT_WORKERS)
+    )
+    logging.info("✅ STT 模型加载完毕")
+
+# multiprocessing 损坏的环境 (如容器缺 /dev/shm) 在构造时不报错，
+# 首次提交任务才抛 BrokenProcessPool — 探活与降级见 main() 的预热提交
+executor = ProcessPoolExecutor(max_workers=STT_WORKERS, initializer=_stt_init)
+
+# 3. 调试抓包开关: 默认关闭，生产路径不打包 WAV 也不写盘
+DEBUG_SAVE_WAV = os.getenv("DEBUG_SAVE_WAV", "0") == "1"
+
+# ---- 二进制帧子协议 ----
+# WebSocket 原生支持二进制帧，音频走裸 PCM 避免 base64 的 33% 膨胀与编解码开销。
+# 收发双方统一按首字节判别帧类型，与 WS opcode (文本/二进制) 无关:
+#   '{' (0x7b)  → JSON 控制信封 (orjson 产出 bytes，经二进制帧送达也能被识别)
+#   tag (<0x20) → 裸载荷直通通道，首字节即 topic，其余为数据
+# 终端侧的对应判别见 websocket_manager.c 的完整帧分发。
+BIN_TAG_AUDIO_PLAY   = b'\x01'  # 服务器 → 终端: TTS PCM 流
+BIN_TAG_AUDIO_STREAM = b'\x02'  # 终端 → 服务器: 录音 PCM 流
+
+# TTS 下行合并下发的双阈值: 积满 FLUSH_BYTES 立即发；不满但距上次下发超过
+# FLUSH_INTERVAL 也发，批量化不会拖迟首包可闻时间
+FLUSH_BYTES = 16384
+FLUSH_INTERVAL = 0.02
+
+# ---- 录音缓冲池 ----
+# 预分配 30s @ 22.05kHz mono 16-bit 的定长缓冲并循环复用，
+# 录音热路径上不再有 bytearray 扩容 realloc，稳态零分配。
+AUDIO_BUF_CAP = 22050 * 2 * 30
+
+_audio_buf_pool: list = []
+
+def _acquire_audio_buf() -> bytearray:
+    return _audio_buf_pool.pop() if _audio_buf_pool else bytearray(AUDIO_BUF_CAP)
+
+def _release_audio_buf(buf: bytearray):
+    _audio_buf_pool.append(buf)
+
+def _append_audio(device_state, data):
+    """向设备的预分配录音缓冲写入一段 PCM (切片赋值，无扩容拷贝)。
+
+    超过池容量的罕见超长发言不丢数据: 溢出段按块挂到 deque，
+    回合开始时与主缓冲 b''.join 一次性拼接 (单次精确分配)。"""
+    start = device_state["audio_len"]
+    end = start + len(data)
+    # 一旦出现过溢出，后续所有块都进 deque (即使块本身装得下主缓冲)，
+    # 否则回合开始的 join 会把晚到的小块排到溢出段之前，时序错乱
+    if end > AUDIO_BUF_CAP or device_state["audio_spill"]:
+        device_state["audio_spill"].append(bytes(data))
+        return
+    device_state["audio_buffer"][start:end] = data
+    device_state["audio_len"] = end
+
+def _preview(obj, n=200):
+    """O(1) 日志预览: 不整条序列化载荷，只展示键与截断后的标量值 (长字符串仅报长度)"""
+    if isinstance(obj, dict):
+        parts = []
+        for k, v in obj.items():
+            if isinstance(v, str) and len(v) > 32:
+                parts.append(f"{k}=<str {len(v)}B>")
+            else:
+                parts.append(f"{k}={v!r}")
+        return "{" + ", ".join(parts)[:n] + "}"
+    return repr(obj)[:n]
 
 # ---- 多终端设备注册表与 Session 状态 ----
 # key: device_id
-# value: { "ws": ws, "addr": addr, "telemetry": {}, "audio_buffer": bytearray, 
-#          "messages": [], "stats": {"rounds": 0, "total_tokens": 0} }
+# value: { "ws": ws, "addr": addr, "telemetry": {}, "audio_buffer": bytearray(定长池),
+#          "audio_len": int, "messages": [], "stats": {"rounds": 0, "total_tokens": 0},
+#          "recording": bool, "stt_partial_pos": int, "stt_lock": asyncio.Lock }
 devices: dict = {}
 
 def get_or_create_device(device_id, websocket, remote):
     if device_id not in devices:
         devices[device_id] = {
+            "id": device_id,
             "ws": websocket,
             "addr": str(remote),
             "telemetry": {},
-            "last_seen": time.strftime("%H:%M:%S"),
-            "audio_buffer": bytearray(), # 每个设备独立的音频缓冲
-            "messages": [],              # 多轮对话历史
-            "stats": {"rounds": 0, "total_tokens": 0} # 统计数据
+            "last_seen": time.monotonic(), # 原始单调时间戳，仅在展示时才格式化
+            "audio_buffer": _acquire_audio_buf(), # 每个设备独立的池化音频缓冲
+            "audio_len": 0,
+            "audio_spill": deque(),      # 超出池容量的溢出块 (见 _append_audio)
+            "messages": [],              # 多轮对话历史 (窗口化，见 _trim_history)
+            "has_system": False,         # messages[0] 是否为 system prompt
+            "stats": {"rounds": 0, "total_tokens": 0}, # 统计数据
+            "recording": False,          # 是否处于录音中 (门控途中识别回显)
+            "stt_partial_pos": 0,        # 上次途中识别已覆盖到的缓冲位置
+            "stt_lock": asyncio.Lock(),  # 每设备同时至多一个在途识别任务
         }
     else:
         devices[device_id]["ws"] = websocket
@@ -87,29 +173,87 @@ def build_chat_bubble(text, is_user=False):
         ]
     }
 
+# ---- 布局静态骨架 ----
+# 以下子树在每次渲染中完全相同，提升为模块级常量 (只读，勿原地修改)。
+# 全量布局只在建连 / 新对话 / 首条消息 (替换占位提示) 时下发，
+# 对话回合内只走 ui/append_child + ui/update 增量帧
+_STATUS_NODE = {
+    "type": "label",
+    "id": "status_label",
+    "text": "🟢 系统就绪，等待唤醒",
+    "font_size": 16,
+    "text_color": "#f1c40f"
+}
+
+_PLACEHOLDER_BUBBLE = {
+    "type": "label",
+    "text": "请按住底部按钮开始对话...",
+    "font_size": 16,
+    "text_color": "#888888",
+    "align": "center"
+}
+
+_CONTROL_BAR = {
+    "type": "container",
+    "flex": "row",
+    "gap": 20,
+    "w": "full",
+    "justify": "center",
+    "children": [
+        {
+            "type": "button",
+            "id": "btn_new_chat",
+            "text": "🔄 新对话",
+            "w": 100, "h": 50,
+            "bg_color": "#e74c3c",
+            "radius": 25,
+            "on_click": "server://ui/new_chat"
+        },
+        {
+            "type": "button",
+            "id": "btn_rec",
+            "text": "🎙️ 按住说话",
+            "w": 140, "h": 50,
+            "bg_color": "#3498db",
+            "radius": 25,
+            "on_press": "local://audio/cmd/record_start",
+            "on_release": "local://audio/cmd/record_stop",
+            # 按下时的呼吸动画
+            "anim": {"type": "color_pulse", "color_a": "#3498db", "color_b": "#2980b9", "duration": 800, "repeat": -1}
+        }
+    ]
+}
+
+# 上下文窗口: 最近 8 轮 (16 条 user/assistant) + system prompt。
+# 不设上限的话每轮都把全量历史发给 LLM，单轮成本随轮数线性涨、
+# 会话总成本平方涨；屏端气泡列表也一并受此界约束
+MAX_HISTORY_MSGS = 16
+
+def _trim_history(device_state):
+    """收缩上下文窗口到 MAX_HISTORY_MSGS 条对话 (保留 system prompt)，返回是否裁剪"""
+    msgs = device_state["messages"]
+    keep_head = 1 if device_state["has_system"] else 0
+    if len(msgs) - keep_head <= MAX_HISTORY_MSGS:
+        return False
+    del msgs[keep_head:len(msgs) - MAX_HISTORY_MSGS]
+    return True
+
 def build_ai_layout(device_state):
     """构建沉浸式 AI 对话终端布局"""
     stats = device_state["stats"]
     messages = device_state["messages"]
-    
-    # 抽取需要展示的对话记录 (过滤掉 system prompt)
-    display_msgs = [m for m in messages if m["role"] != "system"]
-    
+
+    # 抽取需要展示的对话记录 (过滤掉 system prompt，且只渲染窗口内的)
+    display_msgs = [m for m in messages if m["role"] != "system"][-MAX_HISTORY_MSGS:]
+
     # 渲染历史对话气泡
-    bubble_children = []
     if not display_msgs:
-        bubble_children.append({
-            "type": "label",
-            "text": "请按住底部按钮开始对话...",
-            "font_size": 16,
-            "text_color": "#888888",
-            "align": "center"
-        })
+        bubble_children = [_PLACEHOLDER_BUBBLE]
     else:
-        for msg in display_msgs:
-            bubble_children.append(build_chat_bubble(msg["content"], is_user=(msg["role"]=="user")))
+        bubble_children = [build_chat_bubble(m["content"], is_user=(m["role"]=="user"))
+                           for m in display_msgs]
 
-    # 构建完整 JSON 树
+    # 构建完整 JSON 树 (静态骨架直接引用常量)
     return {
         "flex": "column",
         "justify": "start",
@@ -117,13 +261,7 @@ def build_ai_layout(device_state):
         "gap": 10,
         "children": [
             # 1. 顶部状态栏
-            {
-                "type": "label",
-                "id": "status_label",
-                "text": "🟢 系统就绪，等待唤醒",
-                "font_size": 16,
-                "text_color": "#f1c40f"
-            },
+            _STATUS_NODE,
             # 2. 统计信息栏
             {
                 "type": "container",
@@ -132,8 +270,8 @@ def build_ai_layout(device_state):
                 "w": "90%",
                 "h": 30,
                 "children": [
-                    {"type": "label", "text": f"💬 轮数: {stats['rounds']}", "font_size": 14, "text_color": "#aaaaaa"},
-                    {"type": "label", "text": f"🪙 Tokens: {stats['total_tokens']}", "font_size": 14, "text_color": "#aaaaaa"}
+                    {"type": "label", "id": "stat_rounds", "text": f"💬 轮数: {stats['rounds']}", "font_size": 14, "text_color": "#aaaaaa"},
+                    {"type": "label", "id": "stat_tokens", "text": f"🪙 Tokens: {stats['total_tokens']}", "font_size": 14, "text_color": "#aaaaaa"}
                 ]
             },
             # 3. 对话历史滚动区
@@ -141,268 +279,691 @@ def build_ai_layout(device_state):
                 "type": "container",
                 "id": "scroll_box",
                 "scrollable": True,
-                "w": "95%", 
+                "w": "95%",
                 "h": 260, # 给底部留出空间
-                "flex": "column", 
+                "flex": "column",
                 "gap": 10,
-                "bg_color": "#111111", 
-                "pad": 10, 
+                "bg_color": "#111111",
+                "pad": 10,
                 "radius": 10,
                 "children": bubble_children
             },
             # 4. 底部交互控制区
-            {
-                "type": "container",
-                "flex": "row",
-                "gap": 20,
-                "w": "full",
-                "justify": "center",
-                "children": [
-                    {
-                        "type": "button",
-                        "id": "btn_new_chat",
-                        "text": "🔄 新对话",
-                        "w": 100, "h": 50,
-                        "bg_color": "#e74c3c",
-                        "radius": 25,
-                        "on_click": "server://ui/new_chat"
-                    },
-                    {
-                        "type": "button",
-                        "id": "btn_rec",
-                        "text": "🎙️ 按住说话",
-                        "w": 140, "h": 50,
-                        "bg_color": "#3498db",
-                        "radius": 25,
-                        "on_press": "local://audio/cmd/record_start",
-                        "on_release": "local://audio/cmd/record_stop",
-                        # 按下时的呼吸动画
-                        "anim": {"type": "color_pulse", "color_a": "#3498db", "color_b": "#2980b9", "duration": 800, "repeat": -1}
-                    }
-                ]
-            }
+            _CONTROL_BAR
         ]
     }
 
+# 空会话首屏是纯静态数据: 启动时构建并序列化一次，
+# 新连接 / 新对话直接下发缓存的 bytes，不再逐次 build + dumps
+EMPTY_LAYOUT_FRAME = orjson.dumps({
+    "topic": "ui/layout",
+    "payload": build_ai_layout({"messages": [], "stats": {"rounds": 0, "total_tokens": 0}})
+})
+
 # ============================================================
 #  辅助发送函数
 # ============================================================
-async def send_topic(ws, topic: str, payload):
-    msg = json.dumps({"topic": topic, "payload": payload}, ensure_ascii=False)
-    await ws.send(msg)
+async def _send_frame(ws, frame: bytes, key=None):
+    """控制帧统一入口: 有出站队列则入队交给写协程合并发送，否则直接发。
+
+    key 用于去抖 — 同一 key (widget id) 在一个批次内只保留最新一帧。"""
+    q = getattr(ws, "_out_q", None)
+    if q is not None:
+        q.put_nowait((key, frame))
+    else:
+        await ws.send(frame)
+
+async def _connection_writer(ws, q: asyncio.Queue):
+    """每连接单写协程: 一次吸干队列、去抖后连续发出，减少事件循环唤醒与小帧数量"""
+    try:
+        while True:
+            batch = [await q.get()]
+            while not q.empty():
+                batch.append(q.get_nowait())
+
+            if len(batch) == 1:
+                await ws.send(batch[0][1])
+                continue
+
+            # 同 widget 的 ui/update 去抖: 只发批次内最新的一帧
+            frames = []
+            latest = {}
+            for key, frame in batch:
+                if key is not None:
+                    if key in latest:
+                        frames[latest[key]] = None
+                    latest[key] = len(frames)
+                frames.append(frame)
+            for frame in frames:
+                if frame is not None:
+                    await ws.send(frame)
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
+# 支持二进制帧的 topic → tag 映射，bytes 载荷经 send_topic 自动走二进制通道
+_BIN_TOPIC_TAGS = {"audio/play": BIN_TAG_AUDIO_PLAY}
+
+async def send_topic(ws, topic: str, payload, _key=None):
+    # bytes 载荷直接发 tag+裸数据的二进制帧，不经过 JSON/base64
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        await ws.send(_BIN_TOPIC_TAGS[topic] + bytes(payload))
+        return
+    # orjson 直接产出 UTF-8 bytes，省去 websockets 内部的 str→bytes 编码
+    await _send_frame(ws, orjson.dumps({"topic": topic, "payload": payload}), _key)
 
 async def send_layout(ws, layout: dict):
     await send_topic(ws, "ui/layout", layout)
 
 async def send_update(ws, widget_id: str, **props):
     update = {"id": widget_id, **props}
-    await send_topic(ws, "ui/update", update)
+    await send_topic(ws, "ui/update", update, _key=widget_id)
+
+# status_label 文本刷新是最高频的固定形态消息: 用预编译模板 + 仅对文本做 JSON 转义，
+# 免去每次的字典构建和整条消息 dumps。send_update 保留为通用慢路径。
+_STATUS_TPL = b'{"topic":"ui/update","payload":{"id":"status_label","text":%b}}'
+
+async def send_status(ws, text: str):
+    await _send_frame(ws, _STATUS_TPL % orjson.dumps(text), "status_label")
+
+async def send_many(ws, frames):
+    """cork 式批量发送: 一组已序列化帧一次性入队，写协程在单次唤醒内连续发出。
+
+    注: 不能用 websockets 的可迭代 send(iter) — 那会把多条消息合并成一个分片消息。"""
+    q = getattr(ws, "_out_q", None)
+    if q is not None:
+        for f in frames:
+            q.put_nowait((None, f))
+    else:
+        for f in frames:
+            await ws.send(f)
 
 # ============================================================
 #  AI 业务流水线 (STT -> LLM -> TTS)
 # ============================================================
-def stt_task(audio_bytes):
-    """[同步任务] 供线程池调用：将字节流写入临时文件并使用 faster-whisper 识别"""
-    tmp_file = f"tmp_stt_{time.time()}.wav"
+# 44 字节 RIFF/fmt/data 头: 参数固定 (mono 16-bit 22050Hz)，只有两个长度字段随数据变化，
+# 预编译 struct 后打包 WAV 不再经过 wave 模块的 Wave_write 对象和纯 Python setter
+_WAV_HDR = struct.Struct("<4sI4s4sIHHIIHH4sI")
+_WAV_RATE = 22050 # 匹配 ESP32 默认录音频率
+
+def make_wav_bytes(audio_bytes) -> bytes:
+    """将裸 PCM 打包为内存中的 WAV (22.05kHz mono 16-bit)，只构建一次供调试保存与 STT 复用"""
+    n = len(audio_bytes)
+    header = _WAV_HDR.pack(
+        b"RIFF", 36 + n, b"WAVE",
+        b"fmt ", 16, 1, 1, _WAV_RATE, _WAV_RATE * 2, 2, 16,
+        b"data", n,
+    )
+    return b"".join((header, audio_bytes))
+
+def _warmup_stt():
+    """[同步任务] 用 0.5s 静音跑一次推理，把模型首次推理的 warmup 成本从首轮对话挪到启动期"""
+    t0 = time.monotonic()
+    list(_whisper_model.transcribe(np.zeros(8000, dtype=np.float32), language="zh")[0])
+    logging.info("🔥 STT 模型预热完成 (%.1fs)", time.monotonic() - t0)
+
+async def _warmup_stt_probe():
+    """预热兼进程池探活: ProcessPoolExecutor 构造并不拉起 worker，
+    multiprocessing 损坏的环境到首次提交才抛 BrokenProcessPool —
+    在这里捕获并降级为单线程池 (模型同样由 initializer 加载)，再重新预热"""
+    global executor
+    loop = asyncio.get_running_loop()
     try:
-        with wave.open(tmp_file, 'wb') as f:
-            f.setnchannels(1)
-            f.setsampwidth(2)
-            f.setframerate(22050) # 匹配 ESP32 默认录音频率
-            f.writeframes(audio_bytes)
-        
-        # 纯本地识别
-        segments, info = whisper_model.transcribe(tmp_file, beam_size=5, language="zh")
-        text = "".join([s.text for s in segments])
-        return text.strip()
-    finally:
-        if os.path.exists(tmp_file):
-            os.remove(tmp_file)
-
-async def process_chat_round(ws, device_id, device_state):
-    """核心 AI 问答流水线"""
-    audio_data = bytes(device_state["audio_buffer"])
-    device_state["audio_buffer"].clear()
-    
-    if len(audio_data) < 10000: # 抛弃过短的无意触碰 (约0.5秒)
-        await send_update(ws, "status_label", text="🟢 等待唤醒...")
-        return
-
-    # --- 保存 debug WAV 便于调试 ---
+        await loop.run_in_executor(executor, _warmup_stt)
+    except BrokenProcessPool:
+        logging.warning("⚠️ STT 进程池不可用，降级为单线程池")
+        executor = ThreadPoolExecutor(max_workers=1, initializer=_stt_init)
+        await loop.run_in_executor(executor, _warmup_stt)
+
+def _save_debug_wav(device_id, wav_bytes):
+    """[同步任务] 保存 debug WAV 便于调试"""
     debug_filename = f"debug_recv_{device_id}.wav"
     try:
-        with wave.open(debug_filename, 'wb') as f:
-            f.setnchannels(1)
-            f.setsampwidth(2)
-            f.setframerate(22050) # 匹配 ESP32 默认录音频率
-            f.writeframes(audio_data)
-        logging.info(f"[{device_id}] 💾 调试音频已保存 → {os.path.abspath(debug_filename)}")
+        with open(debug_filename, 'wb') as f:
+            f.write(wav_bytes)
+        logging.info("[%s] 💾 调试音频已保存 → %s", device_id, os.path.abspath(debug_filename))
     except Exception as e:
-        logging.error(f"[{device_id}] ✗ 无法保存调试音频: {e}")
+        logging.error("[%s] ✗ 无法保存调试音频: %s", device_id, e)
+
+def stt_task(pcm_bytes):
+    """[同步任务] 供线程池调用：裸 PCM 直接转 numpy 数组喂给 faster-whisper，
+    跳过 WAV 容器打包与内部音频解码 (纯本地，无磁盘 IO)"""
+    pcm = np.frombuffer(pcm_bytes, dtype=np.int16).astype(np.float32) / 32768.0
+    # faster-whisper 的 ndarray 输入约定为 16kHz: 原来由 WAV 解码隐式完成的
+    # 重采样在这里用线性插值显式做掉 (22.05k → 16k，对语音识别足够)
+    target_len = int(len(pcm) * 16000 / _WAV_RATE)
+    pcm = np.interp(
+        np.linspace(0, len(pcm), target_len, endpoint=False),
+        np.arange(len(pcm)), pcm
+    ).astype(np.float32)
+    # 短句语音助手用贪心解码 (beam=1) 足够，比 beam-5 少 ~5x 解码遍数；
+    # VAD 直接跳过首尾静音帧；不携带跨段上下文，避免无谓的 prompt 解码
+    segments, info = _whisper_model.transcribe(
+        pcm,
+        beam_size=1, best_of=1,
+        language="zh",
+        vad_filter=True,
+        vad_parameters={"min_silence_duration_ms": 300},
+        condition_on_previous_text=False,
+        without_timestamps=True,
+    )
+    text = "".join([s.text for s in segments])
+    return text.strip()
+
+# ---- 录音途中的增量识别 ----
+# 上传每累积 ~1.5s 新音频就对整段已收内容跑一遍 STT，结果仅用于状态栏回显，
+# 用户说话时就能看到文字出现；最终文本仍以 stop 后的全量识别为准
+PARTIAL_STT_BYTES = int(_WAV_RATE * 2 * 1.5)
+
+async def _partial_stt(ws, device_state):
+    """对当前已累积音频跑一遍途中识别并回显到状态栏"""
+    async with device_state["stt_lock"]:
+        if not device_state["recording"]: # 任务排队期间录音已结束，放弃
+            return
+        length = device_state["audio_len"]
+        device_state["stt_partial_pos"] = length
+        # memoryview 切片不产生中间拷贝，bytes() 是唯一一次 (跨进程提交所需)
+        pcm = bytes(memoryview(device_state["audio_buffer"])[:length])
+        try:
+            partial = await asyncio.get_running_loop().run_in_executor(executor, stt_task, pcm)
+        except Exception as e:
+            logging.debug("途中识别失败 (忽略): %s", e)
+            return
+        # 录音此时可能已结束并进入正式回合，过期的中间结果不再上屏
+        if partial and device_state["recording"]:
+            await send_status(ws, "👂 " + partial)
+
+def _maybe_spawn_partial_stt(ws, device_state):
+    """音频追加后的触发检查: 增量足够大且该设备无在途任务时才起新识别"""
+    if (device_state["recording"]
+            and device_state["audio_len"] - device_state["stt_partial_pos"] >= PARTIAL_STT_BYTES
+            and not device_state["stt_lock"].locked()):
+        asyncio.create_task(_partial_stt(ws, device_state))
 
+async def process_chat_round(ws, device_id, device_state):
+    """核心 AI 问答流水线"""
+    # 将录满的缓冲整体摘下、换上池中空闲缓冲: 流水线与下一轮录音互不干扰
+    buf = device_state["audio_buffer"]
+    audio_len = device_state["audio_len"]
+    spill = tuple(device_state["audio_spill"]) or None # 超长发言的溢出块快照
+    device_state["audio_spill"].clear()
+    device_state["audio_buffer"] = _acquire_audio_buf()
+    device_state["audio_len"] = 0
+
+    # ---- 1. 本地 STT (流水线中唯一持有池化缓冲的阶段) ----
+    # 不再做整段 bytes() 拷贝: memoryview 直接交给 numpy 零拷贝引用，
+    # 唯一的拷贝是 stt_task 里无法避免的 float32 转换
     try:
-        # 1. 本地 STT (放到线程池中防阻塞异步循环)
-        await send_update(ws, "status_label", text="🎙️ 正在识别...")
-        loop = asyncio.get_running_loop()
-        user_text = await loop.run_in_executor(executor, stt_task, audio_data)
-        
-        if not user_text:
-            logging.warning(f"[{device_id}] STT 识别为空")
-            await send_update(ws, "status_label", text="⚠️ 未听到声音，请重试")
+        if audio_len < 10000 and not spill: # 抛弃过短的无意触碰 (约0.5秒)
+            await send_status(ws, "🟢 等待唤醒...")
             return
 
-        logging.info(f"[{device_id}] 用户: {user_text}")
-        
-        # 存入上下文并刷新 UI (展示用户提问气泡)
+        if spill:
+            # join 按总长单次精确分配，主缓冲经 memoryview 参与拼接无中间拷贝
+            pcm = memoryview(b"".join((memoryview(buf)[:audio_len], *spill)))
+        else:
+            pcm = memoryview(buf)[:audio_len]
+        if DEBUG_SAVE_WAV:
+            # WAV 打包 + 磁盘写只在显式开启抓包时发生，且放到线程中避免卡事件循环
+            await asyncio.to_thread(_save_debug_wav, device_id, make_wav_bytes(pcm))
+
+        await send_status(ws, "🎙️ 正在识别...")
+        # 跨进程提交必须可 pickle: 这里的 bytes() 是进程池方案唯一保留的整段拷贝
+        user_text = await asyncio.get_running_loop().run_in_executor(executor, stt_task, bytes(pcm))
+    except Exception as e:
+        logging.error("[%s] STT Error: %s", device_id, e)
+        await send_status(ws, "❌ 发生错误，请重试")
+        return
+    finally:
+        # STT 完成后数据已是独立的 float32 数组，立刻归还缓冲，
+        # 耗时的 LLM/TTS 阶段不占用池
+        _release_audio_buf(buf)
+
+    if not user_text:
+        logging.warning("[%s] STT 识别为空", device_id)
+        await send_status(ws, "⚠️ 未听到声音，请重试")
+        return
+
+    logging.info("[%s] 用户: %s", device_id, user_text)
+    await _run_chat_pipeline(ws, device_id, device_state, user_text)
+
+async def _synth_sentence(text):
+    """合成单句 TTS 并返回音频块列表 (多句之间并发进行)"""
+    # ESP32 默认 I2S 驱动能完美播放 16bit-Mono PCM 流，我们将 edge-tts 格式与之匹配
+    communicate = edge_tts.Communicate(
+        text=text,
+        voice="zh-CN-XiaoxiaoNeural", # 微软优质中文女声
+        rate="+10%",                  # 稍微加快一点语速显得更智能
+        output_format="raw-16khz-16bit-mono-pcm"
+    )
+    chunks = []
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            chunks.append(chunk["data"])
+    return chunks
+
+# 一段话一次握手: begin 帧携带采样格式，终端可据此一次性配置 I2S /
+# 预分配环形缓冲；end 帧标记语段收尾 (排空缓冲、复位播放状态机)。
+# 中间的 PCM 仍走自描述的 tag 二进制帧。两帧均为纯静态，启动时序列化一次
+_PLAY_BEGIN_FRAME = orjson.dumps({
+    "topic": "audio/play_begin",
+    "payload": {"sample_rate": 16000, "bits": 16, "channels": 1}
+})
+_PLAY_END_FRAME = orjson.dumps({"topic": "audio/play_end", "payload": {}})
+
+async def _stream_tts_audio(ws, tts_queue):
+    """按句序消费 TTS 合成任务，音频经大小/时间双阈值合并后下发 (None 为结束哨兵)"""
+    loop = asyncio.get_running_loop()
+    # tag 字节直接预置在缓冲头部，flush 时整段发出，循环内零拼接拷贝
+    chunk_buffer = bytearray(BIN_TAG_AUDIO_PLAY)
+    last_flush = loop.time()
+    started = False
+    while True:
+        task = await tts_queue.get()
+        if task is None:
+            break
+        for data in await task:
+            # begin/end 必须与音频帧同信道直发 (不走出站队列)，保证时序
+            if not started:
+                started = True
+                await ws.send(_PLAY_BEGIN_FRAME)
+            chunk_buffer.extend(data)
+
+            # 大小或时间双阈值合并下发: 发送次数比固定小切片少一个量级，
+            # 终端 I2S 环形缓冲足以吃下；无需 sleep 限速，ws.send 自带反压
+            if len(chunk_buffer) >= 1 + FLUSH_BYTES or (
+                    len(chunk_buffer) > 1 and loop.time() - last_flush >= FLUSH_INTERVAL):
+                await ws.send(chunk_buffer)
+                del chunk_buffer[1:]
+                last_flush = loop.time()
+
+    # 发送剩余的切片与收尾帧
+    if len(chunk_buffer) > 1:
+        await ws.send(chunk_buffer)
+    if started:
+        await ws.send(_PLAY_END_FRAME)
+
+async def _run_chat_pipeline(ws, device_id, device_state, user_text):
+    """LLM 问答 + TTS 下发 (STT 已完成)"""
+    loop = asyncio.get_running_loop()
+    try:
+        # 存入上下文并刷新 UI (展示用户提问气泡)，气泡与状态更新成批下发。
+        # 回合内 UI 只做增量追加 (O(1) 帧)，不再整树重发；
+        # 唯独首条消息仍走全量布局，以替换掉屏上的占位提示
+        first_display = not any(m["role"] != "system" for m in device_state["messages"])
         device_state["messages"].append({"role": "user", "content": user_text})
-        await send_layout(ws, build_ai_layout(device_state))
-        
+        if first_display:
+            user_frame = orjson.dumps({"topic": "ui/layout", "payload": build_ai_layout(device_state)})
+        else:
+            user_frame = orjson.dumps({"topic": "ui/append_child", "payload": {
+                "parent_id": "scroll_box",
+                "child": build_chat_bubble(user_text, is_user=True)}})
+        await send_many(ws, (
+            user_frame,
+            _STATUS_TPL % orjson.dumps("🧠 DeepSeek 思考中..."),
+        ))
+
         # 2. DeepSeek 大模型请求
-        await send_update(ws, "status_label", text="🧠 DeepSeek 思考中...")
-        
-        # 如果是首次对话，注入系统提示词
-        if not any(m["role"] == "system" for m in device_state["messages"]):
+
+        # 如果是首次对话，注入系统提示词 (has_system 标志免去每轮扫描)
+        if not device_state["has_system"]:
             device_state["messages"].insert(0, {
-                "role": "system", 
+                "role": "system",
                 "content": "你是运行在 ESP32 智能终端上的语音助手，请用简短、自然、口语化的中文回答用户。"
             })
+            device_state["has_system"] = True
 
-        response = await aclient.chat.completions.create(
+        response_stream = await aclient.chat.completions.create(
             model="deepseek-chat",
-            messages=device_state["messages"]
+            messages=device_state["messages"],
+            stream=True,
+            stream_options={"include_usage": True}, # 最后一个增量携带 usage
         )
-        
-        ai_text = response.choices[0].message.content
-        used_tokens = response.usage.total_tokens
-        
-        logging.info(f"[{device_id}] AI: {ai_text} (消耗 {used_tokens} tokens)")
-        
-        # 记录状态并刷新 UI (展示 AI 回复气泡和状态更新)
+
+        # 3. 句级流水线: LLM 增量按句读切分，每满一句立刻并发启动该句的 TTS，
+        # 下发协程按句序消费 — 剩余 token 的网络等待与 TTS 合成/下发完全重叠，
+        # 首包可闻延迟从 T_llm全文+T_tts首块 降到 T_llm首句+T_tts首块
+        tts_queue: asyncio.Queue = asyncio.Queue()
+        sender = asyncio.create_task(_stream_tts_audio(ws, tts_queue))
+
+        ai_parts = []
+        pending = ""
+        used_tokens = 0
+        first_sentence = True
+        try:
+            async for part in response_stream:
+                if part.usage:
+                    used_tokens = part.usage.total_tokens
+                if not part.choices:
+                    continue
+                delta = part.choices[0].delta.content or ""
+                if not delta:
+                    continue
+                ai_parts.append(delta)
+                pending += delta
+
+                cut = max(pending.rfind(p) for p in "。！？\n")
+                if cut < 0:
+                    continue
+                sentence, pending = pending[:cut + 1].strip(), pending[cut + 1:]
+                if sentence:
+                    if first_sentence:
+                        first_sentence = False
+                        await send_status(ws, "🔊 正在播放...")
+                    tts_queue.put_nowait(asyncio.create_task(_synth_sentence(sentence)))
+
+            if pending.strip():
+                tts_queue.put_nowait(asyncio.create_task(_synth_sentence(pending.strip())))
+        finally:
+            tts_queue.put_nowait(None) # 句子出完，通知下发协程收尾
+
+        ai_text = "".join(ai_parts)
+        logging.info("[%s] AI: %s (消耗 %d tokens)", device_id, ai_text, used_tokens)
+
+        # 记录状态并刷新 UI (追加 AI 回复气泡 + 刷新两个统计标签)，此时音频仍在并行下发
         device_state["messages"].append({"role": "assistant", "content": ai_text})
-        device_state["stats"]["rounds"] += 1
-        device_state["stats"]["total_tokens"] += used_tokens
-        await send_layout(ws, build_ai_layout(device_state))
-        
-        # 3. Edge-TTS 合成并下发流
-        await send_update(ws, "status_label", text="🔊 正在播放...")
-        
-        # ESP32 默认 I2S 驱动能完美播放 16bit-Mono PCM 流，我们将 edge-tts 格式与之匹配
-        communicate = edge_tts.Communicate(
-            text=ai_text, 
-            voice="zh-CN-XiaoxiaoNeural", # 微软优质中文女声
-            rate="+10%",                  # 稍微加快一点语速显得更智能
-            output_format="raw-16khz-16bit-mono-pcm" 
-        )
-        
-        chunk_buffer = bytearray()
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                chunk_buffer.extend(chunk["data"])
-                
-                # 每积累约 2KB 下发一次切片 (避免终端内存 OOM)
-                if len(chunk_buffer) >= 2048:
-                    b64_chunk = base64.b64encode(chunk_buffer).decode('utf-8')
-                    await send_topic(ws, "audio/play", b64_chunk)
-                    chunk_buffer.clear()
-                    await asyncio.sleep(0.01) # 略微让渡 CPU 防网络拥塞
-
-        # 发送剩余的切片
-        if len(chunk_buffer) > 0:
-            b64_chunk = base64.b64encode(chunk_buffer).decode('utf-8')
-            await send_topic(ws, "audio/play", b64_chunk)
-
-        await send_update(ws, "status_label", text="🟢 系统就绪，等待唤醒")
+        stats = device_state["stats"]
+        stats["rounds"] += 1
+        stats["total_tokens"] += used_tokens
+        if _trim_history(device_state):
+            # 窗口收缩的回合走一次全量布局: 把屏端积累的旧气泡一并清掉，
+            # 设备侧子节点数与服务端窗口同界
+            await send_layout(ws, build_ai_layout(device_state))
+        else:
+            await send_many(ws, (
+                orjson.dumps({"topic": "ui/append_child", "payload": {
+                    "parent_id": "scroll_box",
+                    "child": build_chat_bubble(ai_text)}}),
+                orjson.dumps({"topic": "ui/update", "payload": {"id": "stat_rounds", "text": f"💬 轮数: {stats['rounds']}"}}),
+                orjson.dumps({"topic": "ui/update", "payload": {"id": "stat_tokens", "text": f"🪙 Tokens: {stats['total_tokens']}"}}),
+            ))
+
+        # 等待音频流全部下发完毕
+        await sender
+        await send_status(ws, "🟢 系统就绪，等待唤醒")
 
     except Exception as e:
-        logging.error(f"[{device_id}] Pipeline Error: {e}")
-        await send_update(ws, "status_label", text="❌ 发生错误，请重试")
+        logging.error("[%s] Pipeline Error: %s", device_id, e)
+        await send_status(ws, "❌ 发生错误，请重试")
+
 
+# ============================================================
+#  Topic 处理器 (O(1) 字典分发，入参统一为 ws/payload/device_state)
+# ============================================================
+async def handle_heartbeat(ws, payload, device_state):
+    """设备遥测心跳 (建连与保活)"""
+    # 遥测快照原地合并 (不整体换 dict，免一次分配)；
+    # last_seen 观测粒度远粗于心跳频率，每秒至多写一次
+    if isinstance(payload, dict):
+        device_state["telemetry"].update(payload)
+    else:
+        device_state["telemetry"] = payload
+    now = time.monotonic()
+    if now - device_state["last_seen"] >= 1.0:
+        device_state["last_seen"] = now
+
+    # 首次收到心跳，下发完整 AI 交互界面 (空会话走预序列化缓存)
+    if not hasattr(ws, 'initialized'):
+        ws.initialized = True
+        if device_state["messages"]:
+            await send_layout(ws, build_ai_layout(device_state))
+        else:
+            await _send_frame(ws, EMPTY_LAYOUT_FRAME)
+
+async def handle_audio_record(ws, payload, device_state):
+    """音频链路 (JSON 控制 + base64 流式回退路径)"""
+    state = payload.get("state")
+    if state == "start":
+        device_state["audio_len"] = 0
+        device_state["audio_spill"].clear() # 上一轮若中途断掉，溢出块不能串到本轮
+        device_state["stt_partial_pos"] = 0
+        device_state["recording"] = True
+        await send_status(ws, "👂 录音中...")
+        # 也可以给界面的某个元素加点动画
+        await send_update(ws, "scroll_box", anim={"type": "breathe", "min_opa": 180, "max_opa": 255, "duration": 1000})
+
+    elif state == "stream":
+        b64_data = payload.get("data", "")
+        if b64_data:
+            # a2b_base64 是 b64decode 底下的 C 入口，跳过 validate 包装层的额外分配
+            # 小切片就地解码最快；大切片 (旧固件可能一次上传几十 KB) 挪到线程，
+            # 避免解码时间拖住事件循环影响其他连接
+            if len(b64_data) < 4096:
+                decoded = binascii.a2b_base64(b64_data)
+            else:
+                decoded = await asyncio.to_thread(binascii.a2b_base64, b64_data)
+            _append_audio(device_state, decoded)
+            _maybe_spawn_partial_stt(ws, device_state)
+
+    elif state == "stop":
+        # 停止动画，启动处理流水线
+        device_state["recording"] = False
+        await send_update(ws, "scroll_box", anim={"type": "none"})
+        asyncio.create_task(process_chat_round(ws, device_state["id"], device_state))
+
+async def handle_new_chat(ws, payload, device_state):
+    """UI 交互: 开启新对话"""
+    logging.info("[%s] 用户请求开启新对话", device_state["id"])
+    # 清理上下文
+    device_state["messages"].clear()
+    device_state["has_system"] = False
+    device_state["stats"] = {"rounds": 0, "total_tokens": 0}
+    # 全量下发刷新屏幕 (空会话布局直接用缓存帧)
+    await _send_frame(ws, EMPTY_LAYOUT_FRAME)
+
+async def handle_noop(ws, payload, device_state):
+    """终端单向上报的事件 (IMU 摇晃 / 无前缀 Action URI)，服务端暂无对应业务"""
+    pass
+
+HANDLERS = {
+    "telemetry/heartbeat": handle_heartbeat,
+    "audio/record": handle_audio_record,
+    "ui/new_chat": handle_new_chat,
+    # 固件会合法上报以下 topic (imu_manager 的摇晃事件、sdui_parser 对
+    # 无前缀 Action URI 的兜底)，显式挂空处理器避免逐条告警刷屏
+    "motion": handle_noop,
+    "ui/click": handle_noop,
+    "ui/action": handle_noop,
+}
 
 # ============================================================
 #  WebSocket 主路由网关
 # ============================================================
+# 入站 JSON 信封用 msgspec 预编译 Struct 解码: 热路径上比通用 dict 解码快数倍，
+# 形状校验在 C 层完成，handler 侧用属性访问替代 .get 链
+class Envelope(msgspec.Struct):
+    topic: str
+    payload: dict | str = {}
+    device_id: str | None = None
+
+_ENVELOPE_DECODER = msgspec.json.Decoder(Envelope)
+
 async def sdui_handler(websocket):
     remote = websocket.remote_address
     connection_device_id = None
-    logging.info(f"✦ 终端已连接: {remote}")
+    logging.info("✦ 终端已连接: %s", remote)
+
+    # 每连接一个出站队列 + 单写协程，UI 更新经其合并/去抖后发出
+    # (音频二进制帧不走队列，直接 ws.send 以保留反压)
+    out_q = asyncio.Queue()
+    websocket._out_q = out_q
+    writer_task = asyncio.create_task(_connection_writer(websocket, out_q))
 
     try:
-        async for message in websocket:
+        while True:
+            # decode=False: 文本帧不再做 UTF-8 → str 转码，整条链路保持 bytes
+            message = await websocket.recv(decode=False)
+
+            # ==== 0. 二进制帧快速通道 (裸 PCM，免 JSON/base64) ====
+            # 首字节区分: JSON 帧必以 '{' 开头，音频帧以 tag 字节开头
+            if message[:1] == BIN_TAG_AUDIO_STREAM:
+                if connection_device_id:
+                    device_state = devices[connection_device_id]
+                    _append_audio(device_state, memoryview(message)[1:])
+                    _maybe_spawn_partial_stt(websocket, device_state)
+                continue
+
             try:
-                data = json.loads(message)
-            except json.JSONDecodeError:
+                data = _ENVELOPE_DECODER.decode(message)
+            except msgspec.DecodeError: # 含 JSON 语法错误与形状校验失败
                 continue
 
-            topic = data.get("topic")
-            payload = data.get("payload", {})
-            msg_device_id = data.get("device_id") or connection_device_id or "UNKNOWN"
+            topic = data.topic
+            payload = data.payload
+            msg_device_id = data.device_id or connection_device_id or "UNKNOWN"
+
+            # isEnabledFor 先挡一道，DEBUG 关闭时连 _preview 都不会执行
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug("↑ RECV [%s] from=%s %s", topic, msg_device_id, _preview(payload))
             
             # 初始化与设备状态绑定
+            if msg_device_id == "UNKNOWN" and topic == "telemetry/heartbeat" and isinstance(payload, dict):
+                # 兼容把 device_id 放在心跳载荷里的固件
+                msg_device_id = payload.get("device_id") or "UNKNOWN"
+
             if msg_device_id != "UNKNOWN":
                 connection_device_id = msg_device_id
                 device_state = get_or_create_device(msg_device_id, websocket, remote)
-            
-            # ==== 1. 设备遥测心跳 (建连与保活) ====
-            if topic == "telemetry/heartbeat":
-                if msg_device_id == "UNKNOWN" and isinstance(payload, dict):
-                    msg_device_id = payload.get("device_id", "UNKNOWN")
-                    connection_device_id = msg_device_id
-                    device_state = get_or_create_device(msg_device_id, websocket, remote)
-                
-                device_state["telemetry"] = payload
-                device_state["last_seen"] = time.strftime("%H:%M:%S")
-                
-                # 首次收到心跳，下发完整 AI 交互界面
-                if not hasattr(websocket, 'initialized'):
-                    websocket.initialized = True
-                    await send_layout(websocket, build_ai_layout(device_state))
-                continue
 
             if not connection_device_id or connection_device_id == "UNKNOWN":
                 continue # 未注册的无效请求
 
-            # ==== 2. 音频链路 ====
-            if topic == "audio/record":
-                state = payload.get("state")
-                if state == "start":
-                    device_state["audio_buffer"].clear()
-                    await send_update(websocket, "status_label", text="👂 录音中...")
-                    # 也可以给界面的某个元素加点动画
-                    await send_update(websocket, "scroll_box", anim={"type": "breathe", "min_opa": 180, "max_opa": 255, "duration": 1000})
-
-                elif state == "stream":
-                    b64_data = payload.get("data", "")
-                    if b64_data:
-                        device_state["audio_buffer"].extend(base64.b64decode(b64_data))
-
-                elif state == "stop":
-                    # 停止动画，启动处理流水线
-                    await send_update(websocket, "scroll_box", anim={"type": "none"})
-                    asyncio.create_task(process_chat_round(websocket, connection_device_id, device_state))
-
-            # ==== 3. UI 交互路由 ====
-            elif topic == "ui/new_chat":
-                logging.info(f"[{connection_device_id}] 用户请求开启新对话")
-                # 清理上下文
-                device_state["messages"].clear()
-                device_state["stats"] = {"rounds": 0, "total_tokens": 0}
-                # 全量下发刷新屏幕
-                await send_layout(websocket, build_ai_layout(device_state))
+            # O(1) 字典分发，未知 topic 不再走整条 if/elif 链
+            handler = HANDLERS.get(topic)
+            if handler is not None:
+                await handler(websocket, payload, device_state)
+            else:
+                # 基线对未知 topic 静默忽略；DEBUG 留痕足够排查，不在 INFO 刷屏
+                logging.debug("[%s] 未知 topic: %s", connection_device_id, topic)
 
     except websockets.exceptions.ConnectionClosed:
         pass
     finally:
-        logging.info(f"✦ 终端断开连接: {remote}")
+        writer_task.cancel()
+        logging.info("✦ 终端断开连接: %s", remote)
         if connection_device_id and connection_device_id in devices:
             devices[connection_device_id]["ws"] = None
 
 
+async def telemetry_reporter(interval=10):
+    """周期性遥测总览: 心跳静默入库，每 interval 秒只打一条汇总日志，
+    日志成本与设备数 × 心跳频率解耦"""
+    while True:
+        await asyncio.sleep(interval)
+        if not devices:
+            continue
+        now = time.monotonic()
+        online = sum(1 for st in devices.values()
+                     if st["ws"] is not None and now - st["last_seen"] < 30)
+        logging.info("♥ 设备总数=%d 在线=%d", len(devices), online)
+
+
+# ============================================================
+#  运维调试控制台 (stdin)
+# ============================================================
+# ---- 控制台命令处理器 (verb → handler) ----
+async def _cmd_help(rest):
+    print("可用命令: " + " | ".join(sorted(CONSOLE_CMDS)))
+
+async def _cmd_devices(rest):
+    for did, st in devices.items():
+        online = "在线" if st["ws"] else "离线"
+        ago = time.monotonic() - st["last_seen"]
+        print(f"{did}  {st['addr']}  {online}  last_seen={ago:.0f}s前  rounds={st['stats']['rounds']}")
+
+async def _cmd_layout(rest):
+    st = devices.get(rest.strip())
+    if st and st["ws"]:
+        await send_layout(st["ws"], build_ai_layout(st))
+        print("ok")
+    else:
+        print("设备不在线")
+
+async def _cmd_update(rest):
+    try:
+        did, widget_id, text = rest.split(" ", 2)
+    except ValueError:
+        print("用法: update <id> <widget> <text>")
+        return
+    st = devices.get(did)
+    if st and st["ws"]:
+        await send_update(st["ws"], widget_id, text=text)
+        print("ok")
+    else:
+        print("设备不在线")
+
+CONSOLE_CMDS = {
+    "help": _cmd_help,
+    "devices": _cmd_devices,
+    "layout": _cmd_layout,
+    "update": _cmd_update,
+}
+
+async def debug_console():
+    """读取 stdin 命令的运维调试控制台。
+
+    通过 connect_read_pipe 做非阻塞行读取: 不像 run_in_executor(None, input)
+    那样把一个 executor 线程永久停在 input() 上。"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    protocol = asyncio.StreamReaderProtocol(reader)
+    try:
+        await loop.connect_read_pipe(lambda: protocol, sys.stdin)
+    except (ValueError, OSError):
+        return # Windows / 无 tty 环境不支持，直接禁用控制台
+
+    logging.info("⌨️ 调试控制台已就绪 (help 查看命令)")
+    while True:
+        raw = await reader.readline()
+        if not raw:
+            break
+        line = raw.decode().strip()
+        if not line:
+            continue
+
+        # 单次 dict 查找分发，不再逐条 startswith 扫描
+        verb, _, rest = line.partition(" ")
+        handler = CONSOLE_CMDS.get(verb)
+        if handler is not None:
+            await handler(rest)
+        else:
+            print(f"未知命令: {verb} (help 查看帮助)")
+
+
 async def main():
-    server = await websockets.serve(sdui_handler, "0.0.0.0", 8080)
+    loop = asyncio.get_running_loop()
+
+    # 默认 executor 只留给零星的短阻塞调用 (getaddrinfo / to_thread 的
+    # base64、调试 WAV 落盘)。显式建一个小池并命名线程，防止库代码
+    # 偷偷把它撑到默认的 CPU*5 规模，也便于在 top 里辨认
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=2, thread_name_prefix="aio-default"))
+
+    # 后台预热 STT (兼进程池探活/降级)，不阻塞服务启动
+    asyncio.create_task(_warmup_stt_probe())
+
+    # compression=None: 载荷是小 JSON 和 base64 音频(本身不可压缩)，deflate 只会白烧 CPU
+    # max_queue=None: 音频上行是突发流量，不做接收端反压限流
+    # max_size=4MB: 允许较大的单帧(长录音切片)
+    server = await websockets.serve(
+        sdui_handler, "0.0.0.0", 8080,
+        compression=None, max_queue=None, max_size=2**22
+    )
     logging.info("=========================================================")
     logging.info("  🚀 SDUI DeepSeek AI Server started on ws://0.0.0.0:8080")
     logging.info("=========================================================")
+
+    # 仅在交互终端下开启调试控制台
+    if sys.stdin.isatty():
+        asyncio.create_task(debug_console())
+
+    asyncio.create_task(telemetry_reporter())
+
     await asyncio.Future()
 
 if __name__ == "__main__":
+    # uvloop 对多路小帧 (UI 更新 / 音频流) 的吞吐提升明显，未安装时回退默认事件循环
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,21 @@
+"""调试音频快速体检: 跳过 44 字节 WAV 头，直接对采样数据做统计。
+
+np.memmap 零拷贝按页映射文件 —— 不把整个文件读进 Python bytes，
+多 GB 的抓包也能直接分析。
+
+用法: python test.py [debug_recv_XXXX.wav]  (缺省取目录下第一个抓包文件)
+"""
+import sys
+import glob
+import numpy as np
+
+path = sys.argv[1] if len(sys.argv) > 1 else next(iter(sorted(glob.glob("debug_recv_*.wav"))), None)
+if not path:
+    sys.exit("未找到 debug_recv_*.wav (先用 DEBUG_SAVE_WAV=1 启动 server 抓包)")
+
+# 服务端抓包固定为 22050Hz 16bit 单声道，offset=44 跳过标准 WAV 头
+arr = np.memmap(path, dtype=np.int16, mode="r", offset=44)
+print(f"文件: {path}")
+print(f"采样数: {arr.size} (~{arr.size / 22050:.2f}s @22050Hz)")
+print(f"峰值: max={arr.max()} min={arr.min()}")
+print(f"非零采样占比: {np.count_nonzero(arr) / arr.size * 100:.1f}%")